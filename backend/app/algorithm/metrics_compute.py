@@ -1,8 +1,14 @@
+import math
+import threading
+import uuid
+from collections import OrderedDict
 from datetime import datetime
 from decimal import Decimal
+from functools import lru_cache
 from re import T
-from typing import List, Optional
-from sqlmodel import Session, select
+from typing import List, Optional, Union
+from sqlalchemy import insert
+from sqlmodel import Session, func, select
 from app.models import SkiingMetric, IMUData, BarometerData
 import pandas as pd
 import numpy as np
@@ -91,30 +97,198 @@ DEBUG_FLAGS = {
 }
 
 
+@lru_cache(maxsize=4096)
+def _to_uuid(value: str) -> uuid.UUID:
+    """解析UUID字符串（缓存结果，批量重算同一用户/设备时避免重复解析）"""
+    return uuid.UUID(value)
+
+
+# 指标列均为两位小数的NUMERIC
+_Q2 = Decimal("0.01")
+
+
+def _d(value: Optional[float]) -> Optional[Decimal]:
+    """浮点数直接转换为两位小数的Decimal，避免经由str()格式化再解析；NaN/inf返回None"""
+    if value is None:
+        return None
+    value = float(value)
+    if not math.isfinite(value):
+        return None
+    return Decimal(value).quantize(_Q2)
+
+
+# 转弯指标缓存：(会话ID, 开始时间, 结束时间, 原始数据版本) -> 各转弯的指标字段
+# 相同时间窗口重复计算时（界面刷新、重跑分析）跳过SkiAnalysisSystem处理
+_TURN_ROWS_CACHE_SIZE = 64
+_turn_rows_cache: "OrderedDict[tuple, tuple[dict, ...]]" = OrderedDict()
+_turn_rows_cache_lock = threading.Lock()
+
+
+def _get_cached_turn_rows(key: tuple) -> Optional[tuple[dict, ...]]:
+    with _turn_rows_cache_lock:
+        rows = _turn_rows_cache.get(key)
+        if rows is not None:
+            _turn_rows_cache.move_to_end(key)
+        return rows
+
+
+def _cache_turn_rows(key: tuple, rows: tuple[dict, ...]) -> None:
+    with _turn_rows_cache_lock:
+        _turn_rows_cache[key] = rows
+        _turn_rows_cache.move_to_end(key)
+        while len(_turn_rows_cache) > _TURN_ROWS_CACHE_SIZE:
+            _turn_rows_cache.popitem(last=False)
+
+
+def _turn_row(turn: dict, slope_angle: Optional[Decimal]) -> dict:
+    """将SkiAnalysisSystem输出的单个转弯映射为SkiingMetric字段"""
+    get = turn.get
+    # 提取转弯的关键指标并映射到数据库字段
+    # 判断这个弯是前刃还是后刃主导
+    front_edge_angle = float(get('front_edge_angle', 0))
+    back_edge_angle = float(get('back_edge_angle', 0))
+    edge_angle_front = _d(front_edge_angle)
+    edge_angle_back = _d(back_edge_angle)
+    speed_kmh = _d(get('avg_skiing_speed'))
+    carving_distance = _d(get('carving_distance', 0))
+    edge_angle_speed_front = edge_angle_speed_back = None
+    edge_displacement_front = edge_displacement_back = None
+
+    # 用原始浮点数比较，NaN不会中断整个会话的计算
+    if abs(front_edge_angle) > abs(back_edge_angle):
+        edge_angle_speed_front = speed_kmh
+        edge_displacement_front = carving_distance
+    else:
+        edge_angle_speed_back = speed_kmh
+        edge_displacement_back = carving_distance
+
+    # 处理edge_time_ratio防止除零
+    carving_time = get('carving_time', 0)
+    turn_duration = get('turn_duration', 1)
+    edge_time_ratio = None
+    if turn_duration and carving_time != 0:
+        try:
+            edge_time_ratio = _d(carving_time / turn_duration)
+        except (ZeroDivisionError, TypeError):
+            edge_time_ratio = None
+
+    return {
+        # 立刃相关指标
+        'edge_angle': _d(get('roll_angle')),
+        'edge_angle_speed': _d(get('avg_vv_kmh')),
+        'edge_angle_front': edge_angle_front or None,
+        'edge_angle_back': edge_angle_back or None,
+        'edge_angle_speed_front': edge_angle_speed_front or None,
+        'edge_angle_speed_back': edge_angle_speed_back or None,
+        'edge_displacement': _d(get('total_distance')),
+        'edge_displacement_front': edge_displacement_front or None,
+        'edge_displacement_back': edge_displacement_back or None,
+        'edge_time_ratio': edge_time_ratio,
+        'edge_duration_seconds': get('carving_time'),
+
+        # 转弯相关指标
+        'turn_detected': True,
+        'turn_direction': get('direction'),
+        'turn_radius': _d(get('turn_radius')),
+        'turn_duration_seconds': get('turn_duration'),
+
+        # 运动相关指标
+        'speed_kmh': speed_kmh,
+        'slope_angle': slope_angle,
+    }
+
+
+def _build_metrics(
+    turn_rows: tuple[dict, ...],
+    user_id: uuid.UUID,
+    device_id: uuid.UUID,
+    session_id: uuid.UUID,
+) -> List[SkiingMetric]:
+    """由转弯指标字段创建新的SkiingMetric记录，没有转弯时返回一条基础记录"""
+    metrics_list = [
+        SkiingMetric(
+            user_id=user_id,
+            device_id=device_id,
+            session_id=session_id,
+            timestamp=datetime.now(),  # 使用当前时间作为时间戳
+            **row,
+        )
+        for row in turn_rows
+    ]
+
+    # 如果有额外的整体数据，也可以添加其他指标
+    if not metrics_list:
+        # 如果没有转弯数据，创建一个基础指标记录
+        metric = SkiingMetric(
+            user_id=user_id,
+            device_id=device_id,
+            session_id=session_id,
+            timestamp=datetime.now(),
+            edge_angle=None,
+            edge_angle_front=None,
+            edge_angle_back=None,
+            edge_angle_speed=None,
+            edge_angle_speed_front=None,
+            edge_angle_speed_back=None,
+            edge_displacement=None,
+            edge_displacement_front=None,
+            edge_displacement_back=None,
+            edge_time_ratio=None,
+            edge_duration_seconds=None,
+            turn_detected=False,
+            turn_direction=None,
+            turn_radius=None,
+            turn_duration_seconds=None,
+            speed_kmh=None,
+            slope_angle=None,
+        )
+        metrics_list.append(metric)
+
+    return metrics_list
+
+
+def persist_metrics(db: Session, metrics_list: List[SkiingMetric]) -> None:
+    """
+    批量写入metrics数据
+
+    使用Core层的批量INSERT一次性提交所有记录，避免ORM逐条flush的开销
+    """
+    if not metrics_list:
+        return
+    # 直接按表列取值，跳过Pydantic序列化（表模型未经校验，model_dump会逐行告警）
+    columns = SkiingMetric.__table__.columns.keys()
+    rows = [{column: getattr(metric, column) for column in columns} for metric in metrics_list]
+    db.execute(insert(SkiingMetric), rows)
+    db.commit()
+
 
 def compute_metrics_from_raw_data(
     db: Session,
-    session_id: str,
-    user_id: str,
-    device_id: str,
+    session_id: Union[str, uuid.UUID],
+    user_id: Union[str, uuid.UUID],
+    device_id: Union[str, uuid.UUID],
     start_time: Optional[datetime] = None,
     end_time: Optional[datetime] = None
 ) -> List[SkiingMetric]:
     """
     从原始数据（IMU、GPS、气压计）计算metrics数据
-    使用SkiAnalysisSystem类进行处理，返回转弯指标并写入数据库
+    使用SkiAnalysisSystem类进行处理，返回转弯指标（由调用方通过persist_metrics写入数据库）
     
     Args:
         db: 数据库会话
-        session_id: 滑雪会话ID
-        user_id: 用户ID
-        device_id: 设备ID
+        session_id: 滑雪会话ID（字符串或UUID）
+        user_id: 用户ID（字符串或UUID）
+        device_id: 设备ID（字符串或UUID）
         start_time: 开始时间（可选）
         end_time: 结束时间（可选）
     
     Returns:
         计算得到的metrics数据列表
     """
+    session_id = _to_uuid(session_id) if isinstance(session_id, str) else session_id
+    user_id = _to_uuid(user_id) if isinstance(user_id, str) else user_id
+    device_id = _to_uuid(device_id) if isinstance(device_id, str) else device_id
+
     print(f"\n{'='*60}")
     print(f"开始计算滑雪指标 - 会话ID: {session_id}")
     print(f"{'='*60}")
@@ -130,6 +304,19 @@ def compute_metrics_from_raw_data(
         imu_conditions.append(IMUData.timestamp <= end_time)
         baro_conditions.append(BarometerData.timestamp <= end_time)
 
+    # 原始数据版本（条数 + 最新时间戳），数据增删后缓存自动失效
+    imu_rev = tuple(db.exec(
+        select(func.count(), func.max(IMUData.timestamp)).where(*imu_conditions)
+    ).one())
+    baro_rev = tuple(db.exec(
+        select(func.count(), func.max(BarometerData.timestamp)).where(*baro_conditions)
+    ).one())
+    cache_key = (session_id, start_time, end_time, imu_rev, baro_rev)
+
+    turn_rows = _get_cached_turn_rows(cache_key)
+    if turn_rows is not None:
+        print(f"✓ 原始数据未变化，复用缓存的 {len(turn_rows)} 个转弯指标")
+        return _build_metrics(turn_rows, user_id, device_id, session_id)
 
     # 获取IMU原始数据
     imu_data = db.exec(
@@ -266,115 +453,26 @@ def compute_metrics_from_raw_data(
 
         print(f"✓ 数据处理完成")
 
-        # 提取转弯数据并创建metrics
-        metrics_list = []
-        total_turns = 0
-
-        if isinstance(results, list):
-            # results是一个包含所有滑雪段分析的列表
-            for segment_result in results:
-                if isinstance(segment_result, dict) and 'turns' in segment_result:
-                    turns = segment_result['turns']
-                    total_turns += len(turns)
-
-                    for turn in turns:
-                        # 提取转弯的关键指标并映射到数据库字段
-                        # 判断这个弯是前刃还是后刃主导
-                        edge_angle_front = Decimal(str(turn.get('front_edge_angle', 0)))
-                        edge_angle_back = Decimal(str(turn.get('back_edge_angle', 0)))
-                        edge_angle_speed_front=Decimal('0')
-                        edge_angle_speed_back=Decimal('0')
-                        edge_displacement_front=Decimal('0')
-                        edge_displacement_back=Decimal('0')
-
-                        if abs(float(edge_angle_front)) > abs(float(edge_angle_back)):
-                            edge_angle_front = Decimal(str(turn.get('front_edge_angle', 0)))
-                            edge_angle_speed_front = Decimal(str(turn.get('avg_skiing_speed', 0)))
-                            edge_displacement_front = Decimal(str(turn.get('carving_distance', 0)))  
-                        else:
-                            edge_angle_back = Decimal(str(turn.get('back_edge_angle', 0)))
-                            edge_angle_speed_back = Decimal(str(turn.get('avg_skiing_speed', 0)))
-                            edge_displacement_back = Decimal(str(turn.get('carving_distance', 0))) 
-
-                        # 处理edge_time_ratio防止除零
-                        carving_time = turn.get('carving_time', 0)
-                        turn_duration = turn.get('turn_duration', 1)
-                        edge_time_ratio = None
-                        if turn_duration and carving_time != 0:
-                            try:
-                                edge_time_ratio = Decimal(str(carving_time)) / Decimal(str(turn_duration))
-                            except (ZeroDivisionError, TypeError):
-                                edge_time_ratio = None
-
-                        metric = SkiingMetric(
-                            user_id=user_id,
-                            device_id=device_id,
-                            session_id=session_id,
-                            timestamp=datetime.now(),  # 使用当前时间作为时间戳
-
-                            # 立刃相关指标 - 转换为Decimal
-                            edge_angle=Decimal(str(turn.get('roll_angle', 0))) if turn.get('roll_angle') is not None else None,
-                            edge_angle_speed=Decimal(str(turn.get('avg_vv_kmh', 0))) if turn.get('avg_vv_kmh') is not None else None,
-                            edge_angle_front=edge_angle_front if edge_angle_front != 0 else None,
-                            edge_angle_back=edge_angle_back if edge_angle_back != 0 else None,
-                            edge_angle_speed_front=edge_angle_speed_front if edge_angle_speed_front != 0 else None,
-                            edge_angle_speed_back=edge_angle_speed_back if edge_angle_speed_back != 0 else None,
-                            edge_displacement=Decimal(str(turn.get('total_distance', 0))) if turn.get('total_distance') is not None else None,
-                            edge_displacement_front=edge_displacement_front if edge_displacement_front != 0 else None,
-                            edge_displacement_back=edge_displacement_back if edge_displacement_back != 0 else None,
-                            edge_time_ratio=edge_time_ratio,
-                            edge_duration_seconds=turn.get('carving_time', None),
-
-                            # 转弯相关指标
-                            turn_detected=True,
-                            turn_direction=turn.get('direction', None),
-                            turn_radius=Decimal(str(turn.get('turn_radius', 0))) if turn.get('turn_radius') is not None else None,
-                            turn_duration_seconds=turn.get('turn_duration', None),
-
-                            # 运动相关指标
-                            speed_kmh=Decimal(str(turn.get('avg_skiing_speed', 0))) if turn.get('avg_skiing_speed') is not None else None,
-                            slope_angle=Decimal(str(segment_result.get('slope_angle', 0))) if segment_result.get('slope_angle') is not None else None,
-                        )
-                        metrics_list.append(metric)
-
-        print(f"✓ 提取到 {len(metrics_list)} 个转弯指标（总共 {total_turns} 个转弯）")
-
-        # 如果有额外的整体数据，也可以添加其他指标
-        if not metrics_list:
-            # 如果没有转弯数据，创建一个基础指标记录
-            metric = SkiingMetric(
-                user_id=user_id,
-                device_id=device_id,
-                session_id=session_id,
-                timestamp=datetime.now(),
-                edge_angle=None,
-                edge_angle_front=None,
-                edge_angle_back=None,
-                edge_angle_speed=None,
-                edge_angle_speed_front=None,
-                edge_angle_speed_back=None,
-                edge_displacement=None,
-                edge_displacement_front=None,
-                edge_displacement_back=None,
-                edge_time_ratio=None,
-                edge_duration_seconds=None,
-                turn_detected=False,
-                turn_direction=None,
-                turn_radius=None,
-                turn_duration_seconds=None,
-                speed_kmh=None,
-                slope_angle=None,
-            )
-            metrics_list.append(metric)
+        # 提取转弯数据（results是一个包含所有滑雪段分析的列表）
+        segments = [
+            # 坡度为整段属性，每段只转换一次
+            (segment_result['turns'], _d(segment_result.get('slope_angle')))
+            for segment_result in results
+            if isinstance(segment_result, dict) and 'turns' in segment_result
+        ] if isinstance(results, list) else []
+        total_turns = sum(len(turns) for turns, _ in segments)
+        turn_rows = tuple(
+            _turn_row(turn, slope_angle)
+            for turns, slope_angle in segments
+            for turn in turns
+        )
 
-        print(f"✓ 指标计算完成，共 {len(metrics_list)} 条记录")
+        print(f"✓ 提取到 {len(turn_rows)} 个转弯指标（总共 {total_turns} 个转弯）")
 
-        # 写入数据库
-        if metrics_list:
-            print("✓ 正在写入数据库...")
-            db.add_all(metrics_list)
-            db.commit()
-            print("✓ 数据库写入完成")
+        _cache_turn_rows(cache_key, turn_rows)
+        metrics_list = _build_metrics(turn_rows, user_id, device_id, session_id)
+
+        print(f"✓ 指标计算完成，共 {len(metrics_list)} 条记录")
 
         return metrics_list
 
@@ -10,7 +10,7 @@ from sqlmodel import Session, select, func, and_
 
 from app.api.deps import CurrentUser, SessionDep
 from app.models import Device, SkiingMetric, SkiingSession, UserDevice
-from app.algorithm.metrics_compute import compute_metrics_from_raw_data
+from app.algorithm.metrics_compute import compute_metrics_from_raw_data, persist_metrics
 
 
 router = APIRouter(prefix="", tags=["ingest"])
@@ -157,8 +157,7 @@ def ingest_metrics_batch(
             )
             rows.append(row)
 
-        db.add_all(rows)
-        db.commit()
+        persist_metrics(db, rows)
 
         return {
             "request_id": request_id,
@@ -344,8 +343,7 @@ def compute_metrics(
         )
         
         # 保存计算结果
-        db.add_all(metrics_list)
-        db.commit()
+        persist_metrics(db, metrics_list)
         
         return ComputeMetricsResponse(
             request_id=payload.request_id,
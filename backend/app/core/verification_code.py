@@ -5,15 +5,52 @@
 
 import json
 import secrets
-import re
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from time import monotonic, time as epoch_time
+from typing import Optional, Dict, Any, Iterable, List
 
 import redis
 from fastapi import HTTPException, status
 
 from app.core.config import settings
 
+# 手机号第二位允许的数字（3-9）对应的位掩码
+_PHONE_PREFIX_MASK = sum(1 << d for d in range(3, 10))
+
+
+# 最近一次生成的(秒级时间戳, ISO时间字符串)
+_iso_now_cache = (0, "")
+
+
+def _iso_now() -> str:
+    """当前UTC时间的ISO字符串，按秒缓存（替代已弃用的datetime.utcnow）"""
+    global _iso_now_cache
+    now = int(epoch_time())
+    if _iso_now_cache[0] != now:
+        _iso_now_cache = (now, datetime.fromtimestamp(now, tz=timezone.utc).isoformat())
+    return _iso_now_cache[1]
+
+
+def _is_plain_json_str(value: str) -> bool:
+    """字符串放入JSON时是否无需任何转义（可打印ASCII且不含引号、反斜杠）"""
+    return value.isascii() and value.isprintable() and '"' not in value and "\\" not in value
+
+
+def _encode_code(code: str, created_at: str, attempts: int) -> str:
+    """
+    编码验证码存储数据（固定三个字段）
+
+    直接拼接字符串代替通用的json.dumps，输出与json.dumps完全一致。
+    这要求两个字符串字段都无需转义：验证码为ASCII数字；created_at由
+    _iso_now生成（仅含数字和 -:T+ ），但verify_code回写时取自已存储的
+    数据，因此同样检查。任一条件不满足时回退到json.dumps
+    """
+    if not (code.isascii() and code.isdigit() and _is_plain_json_str(created_at)):
+        return json.dumps({"code": code, "created_at": created_at, "attempts": attempts})
+    return f'{{"code": "{code}", "created_at": "{created_at}", "attempts": {attempts}}}'
+
 
 class VerificationCodeService:
     """验证码服务类"""
@@ -47,9 +84,20 @@ class VerificationCodeService:
             )
     
     def validate_phone(self, phone: str) -> bool:
-        """验证手机号格式"""
-        pattern = r'^1[3-9]\d{9}$'
-        return bool(re.match(pattern, phone))
+        """验证手机号格式（11位数字，1开头，第二位为3-9）"""
+        # 直接用字符串操作判断，无需进入正则引擎；
+        # 先确认全为ASCII数字，第二位再查位掩码
+        return (
+            len(phone) == 11
+            and phone[0] == "1"
+            and phone.isascii()
+            and phone.isdigit()
+            and bool((_PHONE_PREFIX_MASK >> (ord(phone[1]) - 48)) & 1)
+        )
+    
+    def validate_phones(self, phones: Iterable[str]) -> List[bool]:
+        """批量验证手机号格式（如批量导入）"""
+        return [self.validate_phone(phone) for phone in phones]
     
     def generate_code(self) -> str:
         """生成6位数字验证码"""
@@ -71,13 +119,9 @@ class VerificationCodeService:
     def store_code(self, phone: str, code: str) -> bool:
         """存储验证码"""
         key = f"{self.prefix}{phone}"
-        data = {
-            "code": code,
-            "created_at": datetime.utcnow().isoformat(),
-            "attempts": 0
-        }
+        data = _encode_code(code, _iso_now(), 0)
         try:
-            return self.redis_client.setex(key, self.expire_seconds, json.dumps(data))
+            return self.redis_client.setex(key, self.expire_seconds, data)
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -98,8 +142,11 @@ class VerificationCodeService:
             if str(data["code"]) == str(input_code):
                 self.redis_client.delete(key)
                 return True
-            data["attempts"] += 1
-            self.redis_client.setex(key, self.expire_seconds, json.dumps(data))
+            self.redis_client.setex(
+                key,
+                self.expire_seconds,
+                _encode_code(str(data["code"]), data["created_at"], data["attempts"] + 1),
+            )
             return False
         except Exception as e:
             raise HTTPException(
@@ -124,44 +171,82 @@ class VerificationCodeService:
 class MockRedis:
     """Mock Redis类，用于开发环境没有Redis时"""
     
+    __slots__ = ("values", "expires", "counters", "_lock")
+    
+    # 最多保留的键数，超出后淘汰最久未写入/访问的键，防止长时间运行时内存无限增长
+    MAXSIZE = 10_000
+    
     def __init__(self):
-        self.data = {}
+        # 值与过期时间分开存放（平铺的dict），避免每个键再套一层dict；
+        # expires包含所有存活的键，其顺序即LRU顺序
+        self.values: Dict[str, str] = {}
+        self.expires: OrderedDict[str, float] = OrderedDict()
+        # 计数器单独以int存放，incr无需在str/int之间来回转换
+        self.counters: Dict[str, int] = {}
+        # 同步接口在线程池中并发执行，所有读写操作需加锁
+        self._lock = threading.Lock()
+    
+    def _expired(self, key: str) -> bool:
+        """键不存在或已过期时返回True，并清理过期键"""
+        if monotonic() > self.expires.get(key, 0):
+            self.values.pop(key, None)
+            self.counters.pop(key, None)
+            self.expires.pop(key, None)
+            return True
+        return False
+    
+    def _touch(self, key: str) -> None:
+        """将键标记为最近使用，并淘汰超出容量的最旧键"""
+        self.expires.move_to_end(key)
+        while len(self.expires) > self.MAXSIZE:
+            oldest, _ = self.expires.popitem(last=False)
+            self.values.pop(oldest, None)
+            self.counters.pop(oldest, None)
     
     def setex(self, key: str, time: int, value: str) -> bool:
-        self.data[key] = {
-            "value": value,
-            "expire_at": datetime.utcnow() + timedelta(seconds=time)
-        }
-        return True
+        with self._lock:
+            # 过期时间使用单调时钟秒数，避免每次读写构造datetime对象
+            self.values[key] = value
+            self.counters.pop(key, None)
+            self.expires[key] = monotonic() + time
+            self._touch(key)
+            return True
     
     def get(self, key: str) -> Optional[str]:
-        if key in self.data:
-            item = self.data[key]
-            if datetime.utcnow() < item["expire_at"]:
-                return item["value"]
-            else:
-                del self.data[key]
-        return None
+        with self._lock:
+            if self._expired(key):
+                return None
+            self.expires.move_to_end(key)
+            value = self.values.get(key)
+            return value if value is not None else str(self.counters[key])
     
     def delete(self, key: str) -> int:
-        if key in self.data:
-            del self.data[key]
-            return 1
-        return 0
+        with self._lock:
+            self.expires.pop(key, None)
+            removed = self.values.pop(key, None) is not None
+            removed = self.counters.pop(key, None) is not None or removed
+            return 1 if removed else 0
     
     def incr(self, key: str) -> int:
-        if key not in self.data:
-            self.data[key] = {"value": "0", "expire_at": datetime.utcnow() + timedelta(hours=1)}
-        current = int(self.data[key]["value"])
-        current += 1
-        self.data[key]["value"] = str(current)
-        return current
+        with self._lock:
+            if self._expired(key):
+                self.expires[key] = monotonic() + 3600
+            current = self.counters.get(key)
+            if current is None:
+                # 先解析再移除，值不是整数时保持原值不变（与Redis一致）
+                current = int(self.values.get(key, 0))
+                self.values.pop(key, None)
+            current += 1
+            self.counters[key] = current
+            self._touch(key)
+            return current
     
     def expire(self, key: str, time: int) -> bool:
-        if key in self.data:
-            self.data[key]["expire_at"] = datetime.utcnow() + timedelta(seconds=time)
-            return True
-        return False
+        with self._lock:
+            if key in self.values or key in self.counters:
+                self.expires[key] = monotonic() + time
+                return True
+            return False
 
 
 class SMSService:
@@ -0,0 +1,31 @@
+import math
+from decimal import Decimal
+
+from app.algorithm.metrics_compute import _d, _turn_row
+
+
+def test_d_quantizes_to_two_places() -> None:
+    assert _d(12.345678) == Decimal("12.35")
+    assert _d(0) == Decimal("0.00")
+    assert _d(None) is None
+
+
+def test_d_returns_none_for_non_finite() -> None:
+    assert _d(math.nan) is None
+    assert _d(math.inf) is None
+    assert _d(-math.inf) is None
+
+
+def test_turn_row_with_nan_edge_angle() -> None:
+    turn = {
+        "front_edge_angle": math.nan,
+        "back_edge_angle": 5.0,
+        "avg_skiing_speed": 30.0,
+        "carving_distance": 4.0,
+    }
+    row = _turn_row(turn, slope_angle=None)
+    assert row["edge_angle_front"] is None
+    assert row["edge_angle_back"] == Decimal("5.00")
+    assert row["edge_angle_speed_back"] == Decimal("30.00")
+    assert row["edge_displacement_back"] == Decimal("4.00")
+    assert row["edge_angle_speed_front"] is None
@@ -0,0 +1,103 @@
+import pytest
+
+from app.core import verification_code
+from app.core.verification_code import MockRedis, verification_code_service
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> FakeClock:
+    fake = FakeClock()
+    monkeypatch.setattr(verification_code, "monotonic", fake)
+    return fake
+
+
+@pytest.mark.parametrize("phone", ["13800138000", "14700000000", "19912345678"])
+def test_validate_phone_accepts_valid(phone: str) -> None:
+    assert verification_code_service.validate_phone(phone)
+
+
+@pytest.mark.parametrize(
+    "phone",
+    [
+        "",
+        "12800138000",  # 第二位不在3-9
+        "23800138000",  # 非1开头
+        "1380013800",  # 10位
+        "138001380000",  # 12位
+        "1380013800a",
+        "13800138000\n",  # 末尾换行（旧正则 $ 会接受）
+        "1380013800²",
+        "１３８００１３８０００",  # 全角数字
+    ],
+)
+def test_validate_phone_rejects_invalid(phone: str) -> None:
+    assert not verification_code_service.validate_phone(phone)
+
+
+def test_validate_phones() -> None:
+    phones = ["13800138000", "12800138000", "13800138000\n", "19912345678"]
+    assert verification_code_service.validate_phones(phones) == [
+        True,
+        False,
+        False,
+        True,
+    ]
+
+
+@pytest.mark.usefixtures("clock")
+def test_mock_redis_get_returns_counter_as_str() -> None:
+    redis = MockRedis()
+    assert redis.incr("rate_limit:13800138000") == 1
+    assert redis.incr("rate_limit:13800138000") == 2
+    assert redis.get("rate_limit:13800138000") == "2"
+
+
+def test_mock_redis_expiry_resets_counter(clock: FakeClock) -> None:
+    redis = MockRedis()
+    redis.incr("rate_limit:13800138000")
+    redis.incr("rate_limit:13800138000")
+    assert redis.expire("rate_limit:13800138000", 60)
+    clock.now += 61
+    assert redis.get("rate_limit:13800138000") is None
+    assert redis.incr("rate_limit:13800138000") == 1
+
+
+def test_mock_redis_setex_expires(clock: FakeClock) -> None:
+    redis = MockRedis()
+    redis.setex("verification_code:13800138000", 300, "data")
+    clock.now += 299
+    assert redis.get("verification_code:13800138000") == "data"
+    clock.now += 2
+    assert redis.get("verification_code:13800138000") is None
+
+
+@pytest.mark.usefixtures("clock")
+def test_mock_redis_incr_keeps_non_integer_value() -> None:
+    redis = MockRedis()
+    redis.setex("key", 60, "abc")
+    with pytest.raises(ValueError):
+        redis.incr("key")
+    assert redis.get("key") == "abc"
+
+
+@pytest.mark.usefixtures("clock")
+def test_mock_redis_evicts_least_recently_used(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(MockRedis, "MAXSIZE", 3)
+    redis = MockRedis()
+    redis.setex("a", 60, "1")
+    redis.incr("b")
+    redis.setex("c", 60, "3")
+    assert redis.get("a") == "1"  # a 变为最近使用
+    redis.setex("d", 60, "4")
+    assert redis.get("b") is None
+    assert [redis.get(key) for key in ("a", "c", "d")] == ["1", "3", "4"]